@@ -0,0 +1,126 @@
+from typing import Any, Callable, Dict, List, Optional
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+# Media types accepted as MessagePack on the way in and out
+_MSGPACK_ALIASES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+
+def _media_type(header_value: Optional[str]) -> str:
+    return (header_value or "").split(";", 1)[0].strip().lower()
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    True when the Accept header prefers MessagePack over JSON.
+    Honours q-values; ties go to whichever type is listed first.
+    """
+    best_q, best_is_msgpack = -1.0, False
+    for part in (accept or "").split(","):
+        media_type = _media_type(part)
+        if media_type not in _MSGPACK_ALIASES and media_type != JSON_MEDIA_TYPE:
+            continue
+        q = 1.0
+        for param in part.split(";")[1:]:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best_q, best_is_msgpack = q, media_type in _MSGPACK_ALIASES
+    return best_is_msgpack and best_q > 0
+
+
+def msgpack_responses(model: Optional[type] = None) -> Dict[int, dict]:
+    """
+    `responses=` entry advertising MessagePack for a 200 in the OpenAPI schema.
+    Negotiated responses bypass `response_model`, so FastAPI can't infer it.
+    """
+    media = {"schema": {"$ref": f"#/components/schemas/{model.__name__}"}} if model else {}
+    return {200: {"content": {MSGPACK_MEDIA_TYPE: media}}}
+
+
+def msgpack_request_body(model: type) -> dict:
+    """`openapi_extra=` entry advertising a MessagePack body with `model`'s schema."""
+    return {
+        "requestBody": {
+            "content": {
+                MSGPACK_MEDIA_TYPE: {"schema": {"$ref": f"#/components/schemas/{model.__name__}"}}
+            }
+        }
+    }
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def negotiate(content: Any, accept: Optional[str]) -> Any:
+    """
+    Encode `content` according to the client's Accept header.
+
+    Pydantic models are returned untouched for JSON clients so FastAPI's
+    `response_model` handling still applies; MessagePack clients get the
+    same fields dumped in JSON mode (enums as values, floats as floats).
+    """
+    if not wants_msgpack(accept):
+        return content
+    if isinstance(content, BaseModel):
+        content = content.model_dump(mode="json")
+    return MsgPackResponse(content)
+
+
+def to_columnar(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Pivot a list of same-shaped dicts into one array per field.
+    Field names are sent once instead of once per row.
+    """
+    if not rows:
+        return {}
+    return {field: [row[field] for row in rows] for field in rows[0]}
+
+
+class MsgPackRequest(Request):
+    """Request whose body is MessagePack; `json()` decodes it instead."""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+
+class MsgPackRoute(APIRoute):
+    """
+    Route class that accepts `application/msgpack` request bodies.
+
+    FastAPI only parses bodies it recognises as JSON, so MessagePack
+    requests are relabelled as JSON and decoded by `MsgPackRequest.json`.
+    The decoded dict is then validated by the endpoint's Pydantic model
+    exactly as a JSON body would be.
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            if _media_type(request.headers.get("content-type")) in _MSGPACK_ALIASES:
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (k, JSON_MEDIA_TYPE.encode()) if k == b"content-type" else (k, v)
+                    for k, v in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
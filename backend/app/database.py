@@ -15,6 +15,8 @@ Base = declarative_base()
 
 class OrderRecord(Base):
     __tablename__ = "orders"
+    # Never reuse ids of rows moved out to the archive (see app/ledger.py)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, index=True, default="user_demo")
@@ -23,10 +25,44 @@ class OrderRecord(Base):
     packaging_type = Column(String)
     carbon_emission_grams = Column(Float)
     eco_score = Column(Integer)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+def _migrate_orders_autoincrement():
+    """
+    Rebuild an `orders` table created before AUTOINCREMENT was declared.
+    create_all never alters an existing table, and without AUTOINCREMENT
+    SQLite hands out ids of deleted (archived) rows again.
+    """
+    with engine.begin() as conn:
+        table_sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'orders'"
+        ).scalar()
+        if table_sql is None or "AUTOINCREMENT" in table_sql.upper():
+            return
+
+        # Indexes follow a renamed table; drop them so the new table can reuse the names
+        index_names = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'orders' AND sql IS NOT NULL"
+        ).scalars().all()
+        for name in index_names:
+            conn.exec_driver_sql(f'DROP INDEX "{name}"')
+        conn.exec_driver_sql("ALTER TABLE orders RENAME TO orders_legacy")
+
+        OrderRecord.__table__.create(conn)
+        columns = ", ".join(column.name for column in OrderRecord.__table__.columns)
+        conn.exec_driver_sql(
+            f"INSERT INTO orders ({columns}) SELECT {columns} FROM orders_legacy"
+        )
+        conn.exec_driver_sql("DROP TABLE orders_legacy")
+
 
 # Create tables immediately
+_migrate_orders_autoincrement()
 Base.metadata.create_all(bind=engine)
+# create_all skips indexes on tables that already exist
+for index in OrderRecord.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 # Dependency to get DB session
 def get_db():
@@ -0,0 +1,331 @@
+"""
+Time-partitioned order ledger.
+
+Recent orders live in the `orders` table (the hot partition). Older months
+are moved by `archive_cold_partitions` into one compressed columnar file per
+month under LEDGER_ARCHIVE_DIR, next to a small per-user summary of that
+month. Aggregate queries span both and prune by month: full archived months
+are a summary lookup, and a window that falls inside the hot months never
+opens an archive file.
+
+Run the archival job with:
+    python -m app.ledger archive [--hot-months N]
+"""
+import argparse
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import msgpack
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import OrderRecord, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = "./ledger_archive"
+DEFAULT_HOT_MONTHS = 3
+
+# Columns stored per archived order; timestamps are UTC epoch seconds
+ARCHIVE_COLUMNS = [
+    "id",
+    "user_id",
+    "distance_km",
+    "transport_mode",
+    "packaging_type",
+    "carbon_emission_grams",
+    "eco_score",
+    "timestamp",
+]
+
+# Times a query re-lists the archive before giving up on a stable listing
+_LISTING_ATTEMPTS = 3
+
+# Per-user month summary: [order count, emissions g, eco score sum, max order id]
+_COUNT, _EMISSIONS, _SCORE_SUM, _MAX_ID = range(4)
+
+
+# ── Settings (read per call so a .env loaded after import still applies) ──
+def get_archive_dir() -> str:
+    return os.getenv("LEDGER_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+
+def get_hot_months() -> int:
+    return int(os.getenv("LEDGER_HOT_MONTHS", str(DEFAULT_HOT_MONTHS)))
+
+
+# ── Partition helpers ────────────────────────────────────────────────
+def month_key(dt: datetime) -> str:
+    return dt.strftime("%Y-%m")
+
+
+def month_start(dt: datetime, months_back: int = 0) -> datetime:
+    """First instant of the month `months_back` months before `dt`."""
+    index = dt.year * 12 + dt.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def archive_path(month: str) -> str:
+    return os.path.join(get_archive_dir(), f"orders-{month}.msgpack.z")
+
+
+def summary_path(month: str) -> str:
+    return os.path.join(get_archive_dir(), f"orders-{month}.users.msgpack")
+
+
+def archived_months() -> List[str]:
+    directory = get_archive_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name[len("orders-"):-len(".msgpack.z")]
+        for name in os.listdir(directory)
+        if name.startswith("orders-") and name.endswith(".msgpack.z")
+    )
+
+
+def _to_epoch(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+# ── Columnar archive files ───────────────────────────────────────────
+@lru_cache(maxsize=2)
+def _read_archive(path: str, mtime_ns: int) -> Dict[str, list]:
+    # Keyed on mtime so a re-archived month is re-read, not served stale.
+    # Small on purpose: queries only decompress the month at the window edge.
+    with open(path, "rb") as f:
+        return msgpack.unpackb(zlib.decompress(f.read()), raw=False)
+
+
+@lru_cache(maxsize=64)
+def _read_summary(path: str, mtime_ns: int) -> Dict[str, list]:
+    with open(path, "rb") as f:
+        return msgpack.unpackb(f.read(), raw=False)
+
+
+def read_partition(month: str) -> Dict[str, list]:
+    """Column arrays for one archived month (empty columns if none)."""
+    path = archive_path(month)
+    if not os.path.exists(path):
+        return {column: [] for column in ARCHIVE_COLUMNS}
+    return _read_archive(path, os.stat(path).st_mtime_ns)
+
+
+def read_summary(month: str) -> Dict[str, list]:
+    """Per-user totals for one archived month, built from its rows if the summary is missing."""
+    path = summary_path(month)
+    if not os.path.exists(path):
+        return _summarise_partition(read_partition(month))
+    return _read_summary(path, os.stat(path).st_mtime_ns)
+
+
+def _summarise_partition(columns: Dict[str, list]) -> Dict[str, list]:
+    summary: Dict[str, list] = {}
+    for i, owner in enumerate(columns["user_id"]):
+        totals = summary.setdefault(owner, [0, 0.0, 0, 0])
+        totals[_COUNT]     += 1
+        totals[_EMISSIONS] += columns["carbon_emission_grams"][i]
+        totals[_SCORE_SUM] += columns["eco_score"][i]
+        totals[_MAX_ID]     = max(totals[_MAX_ID], columns["id"][i])
+    return summary
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_partition(month: str, columns: Dict[str, list]) -> None:
+    _write_atomic(archive_path(month), zlib.compress(msgpack.packb(columns, use_bin_type=True), 9))
+    _write_atomic(summary_path(month), msgpack.packb(_summarise_partition(columns), use_bin_type=True))
+
+
+def _reserve_archived_ids(db: Session, max_id: int) -> None:
+    # Keep AUTOINCREMENT above every archived id, even for rows archived
+    # before the table was migrated to AUTOINCREMENT
+    conn = db.connection()
+    row = conn.exec_driver_sql(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'orders'"
+    ).first()
+    if row is None:
+        conn.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('orders', ?)", (max_id,)
+        )
+    elif row[0] < max_id:
+        conn.exec_driver_sql(
+            "UPDATE sqlite_sequence SET seq = ? WHERE name = 'orders'", (max_id,)
+        )
+
+
+def archive_cold_partitions(db: Session, hot_months: Optional[int] = None) -> Dict[str, int]:
+    """
+    Move every order older than the last `hot_months` calendar months
+    (plus the current one) out of the `orders` table into monthly archive
+    files. Returns the number of rows newly added to each month's archive.
+
+    Each month's files are written before its rows are deleted, and rows are
+    merged by id, so rerunning after a crash never loses or duplicates orders.
+    """
+    if hot_months is None:
+        hot_months = get_hot_months()
+    cutoff = month_start(datetime.utcnow(), hot_months)
+    archived = {}
+
+    oldest = db.query(func.min(OrderRecord.timestamp)).scalar()
+    while oldest is not None and oldest < cutoff:
+        start = month_start(oldest)
+        end = month_start(start, -1)
+        month = month_key(start)
+        orders = (
+            db.query(OrderRecord)
+            .filter(OrderRecord.timestamp >= start, OrderRecord.timestamp < end)
+            .all()
+        )
+
+        existing = read_partition(month)
+        known_ids = set(existing["id"])
+        columns = {column: list(existing[column]) for column in ARCHIVE_COLUMNS}
+        appended = 0
+        for order in orders:
+            if order.id in known_ids:
+                continue
+            appended += 1
+            for column in ARCHIVE_COLUMNS:
+                value = getattr(order, column)
+                columns[column].append(_to_epoch(value) if column == "timestamp" else value)
+        _write_partition(month, columns)
+
+        db.query(OrderRecord).filter(
+            OrderRecord.id.in_([order.id for order in orders])
+        ).delete(synchronize_session=False)
+        if columns["id"]:
+            _reserve_archived_ids(db, max(columns["id"]))
+        db.commit()
+        # Rows already in the file (from a crashed earlier run) aren't counted again
+        archived[month] = appended
+
+        oldest = (
+            db.query(func.min(OrderRecord.timestamp))
+            .filter(OrderRecord.timestamp >= end)
+            .scalar()
+        )
+
+    # Backfill summaries for months archived before summaries existed
+    for month in archived_months():
+        if not os.path.exists(summary_path(month)):
+            summary = _summarise_partition(read_partition(month))
+            _write_atomic(summary_path(month), msgpack.packb(summary, use_bin_type=True))
+
+    return archived
+
+
+# ── Queries spanning hot table + archives ────────────────────────────
+def aggregate_user_orders(db: Session, user_id: str, days: Optional[int] = None) -> dict:
+    """
+    Order count, emission and eco-score sums, and newest order id for a user,
+    over the last `days` days (all time when None).
+
+    Every month is counted from exactly one source: months that have an
+    archive file come from the archive, later months from the hot table.
+    That split holds while the archive job is mid-month (file written, rows
+    not yet deleted), and the listing is re-checked after the SQL query so a
+    month archived in between is not missed. If the listing keeps changing,
+    the last attempt is used and a warning is logged, because its totals
+    may be briefly off by the month being archived.
+
+    Within the window, full archived months are a per-user summary lookup;
+    only the month containing the window start is scanned row by row.
+    """
+    since = datetime.utcnow() - timedelta(days=days) if days is not None else None
+
+    for _ in range(_LISTING_ATTEMPTS):
+        months = archived_months()
+        hot_since = since
+        if months:
+            first_hot = month_start(datetime.strptime(months[-1], "%Y-%m"), -1)
+            hot_since = first_hot if since is None else max(since, first_hot)
+
+        query = db.query(
+            func.count(OrderRecord.id),
+            func.coalesce(func.sum(OrderRecord.carbon_emission_grams), 0.0),
+            func.coalesce(func.sum(OrderRecord.eco_score), 0),
+            func.coalesce(func.max(OrderRecord.id), 0),
+        ).filter(OrderRecord.user_id == user_id)
+        if hot_since is not None:
+            query = query.filter(OrderRecord.timestamp >= hot_since)
+        count, emissions, score_sum, last_id = query.one()
+
+        if archived_months() == months:
+            break
+    else:
+        logger.warning(
+            f"Archive listing changed during {_LISTING_ATTEMPTS} attempts to aggregate "
+            f"orders for {user_id}; totals may be inconsistent until archival finishes"
+        )
+
+    totals = {
+        "total_orders":  count,
+        "emissions_g":   emissions,
+        "eco_score_sum": score_sum,
+        "last_order_id": last_id,
+    }
+
+    first_month = month_key(since) if since is not None else ""
+    for month in months:
+        if month < first_month:
+            continue
+        user_summary = read_summary(month).get(user_id)
+        if user_summary is None:
+            continue
+
+        if month == first_month and since > month_start(since):
+            # Window starts mid-month: only this month needs its rows
+            columns = read_partition(month)
+            since_epoch = _to_epoch(since)
+            for i, owner in enumerate(columns["user_id"]):
+                if owner != user_id or columns["timestamp"][i] < since_epoch:
+                    continue
+                totals["total_orders"]  += 1
+                totals["emissions_g"]   += columns["carbon_emission_grams"][i]
+                totals["eco_score_sum"] += columns["eco_score"][i]
+                totals["last_order_id"]  = max(totals["last_order_id"], columns["id"][i])
+            continue
+
+        totals["total_orders"]  += user_summary[_COUNT]
+        totals["emissions_g"]   += user_summary[_EMISSIONS]
+        totals["eco_score_sum"] += user_summary[_SCORE_SUM]
+        totals["last_order_id"]  = max(totals["last_order_id"], user_summary[_MAX_ID])
+
+    return totals
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="EcoIntellect order ledger maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    archive = subcommands.add_parser("archive", help="Move cold months into archive files")
+    archive.add_argument("--hot-months", type=int, default=get_hot_months())
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        archived = archive_cold_partitions(db, args.hot_months)
+    finally:
+        db.close()
+    for month, rows in archived.items():
+        print(f"{month}: archived {rows} orders -> {archive_path(month)}")
+    if not archived:
+        print("Nothing to archive.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
+from typing import Optional
+import asyncio
+import json
 import random
 
 from app.models import (
@@ -15,7 +20,16 @@ from app.models import (
 from app.services.emissions_calculator import EmissionsCalculator
 from app.services.greenpt_integration import GreenPTClient
 from app.services.wolfram_integration import WolframClient
-from app.database import get_db, OrderRecord
+from app.services.impact_stream import ImpactBroker
+from app.database import get_db, SessionLocal, OrderRecord
+from app.ledger import aggregate_user_orders
+from app.content_negotiation import (
+    MsgPackRoute,
+    msgpack_request_body,
+    msgpack_responses,
+    negotiate,
+    to_columnar,
+)
 
 # Load environment variables from .env
 load_dotenv()
@@ -24,6 +38,15 @@ load_dotenv()
 greenpt = GreenPTClient()    # Uses GREENPT_API_KEY from .env
 wolfram = WolframClient()    # Uses WOLFRAM_APP_ID from .env
 
+# Longest `days` window accepted by the user-impact endpoints (~10 years)
+MAX_IMPACT_DAYS = 3650
+
+# ── Live impact pub/sub (per worker) ─────────────────────────────────
+impact_broker = ImpactBroker(buffer_size=16)
+STREAM_KEEPALIVE_SECONDS = 15
+# Streams re-aggregate this often so orders leaving the `days` window drop out
+STREAM_RESEED_SECONDS = 3600
+
 app = FastAPI(
     title="EcoIntellect API",
     description=(
@@ -48,6 +71,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Content negotiation ──────────────────────────────────────────────
+# Every route below accepts `application/msgpack` bodies and answers in
+# MessagePack when the client's Accept header prefers it.
+app.router.route_class = MsgPackRoute
+
 
 # ── Root ─────────────────────────────────────────────────────────────
 @app.get("/", tags=["analysis"])
@@ -65,6 +93,7 @@ def root():
             "analyze_order":       "POST /api/v1/analyze-order",
             "compare_alternatives":"GET  /api/v1/compare-alternatives",
             "user_impact":         "GET  /api/v1/user-impact/{user_id}",
+            "user_impact_stream":  "GET  /api/v1/user-impact/{user_id}/stream",
         },
     }
 
@@ -78,16 +107,25 @@ def health_check():
 @app.post(
     "/api/v1/analyze-order",
     response_model=OrderAnalysisResponse,
+    responses=msgpack_responses(OrderAnalysisResponse),
+    openapi_extra=msgpack_request_body(OrderAnalysisRequest),
     tags=["analysis"],
     summary="Analyse the environmental impact of a food delivery order",
 )
-def analyze_order(request: OrderAnalysisRequest, db: Session = Depends(get_db)):
+def analyze_order(
+    request: OrderAnalysisRequest,
+    db: Session = Depends(get_db),
+    accept: Optional[str] = Header(None),
+):
     """
     Returns carbon emissions, eco score, better alternatives,
     and a Wolfram|One-powered yearly projection.
 
     **Emission factors** are sourced via the GreenPT integration layer.  
     **Yearly projections** are computed by Wolfram|One.
+
+    Send `Content-Type: application/msgpack` and/or
+    `Accept: application/msgpack` to use MessagePack instead of JSON.
     """
     try:
         transport_mode  = request.transport_mode.value
@@ -131,14 +169,23 @@ def analyze_order(request: OrderAnalysisRequest, db: Session = Depends(get_db)):
         db.add(db_order)
         db.commit()
 
-        return OrderAnalysisResponse(
+        # ── Notify live dashboards ───────────────────────────────────
+        impact_broker.publish(db_order.user_id, {
+            "order_id":              db_order.id,
+            "transport_mode":        transport_mode,
+            "packaging_type":        packaging_type,
+            "carbon_emission_grams": total_emissions,
+            "eco_score":             eco_score,
+        })
+
+        return negotiate(OrderAnalysisResponse(
             carbon_emission_grams=total_emissions,
             eco_score=eco_score,
             rating=rating,
             better_alternatives=alternatives,
             yearly_projection=YearlyProjection(**yearly_proj),
             environmental_context=env_context,
-        )
+        ), accept)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -147,6 +194,7 @@ def analyze_order(request: OrderAnalysisRequest, db: Session = Depends(get_db)):
 # ── GET /api/v1/compare-alternatives ─────────────────────────────────
 @app.get(
     "/api/v1/compare-alternatives",
+    responses=msgpack_responses(),
     tags=["analysis"],
     summary="Compare every transport × packaging combination for a given distance",
 )
@@ -154,37 +202,35 @@ def compare_alternatives(
     distance_km: float,
     transport_mode: str = "car",
     packaging_type: str = "plastic",
+    layout: str = Query("rows", pattern="^(rows|columnar)$"),
+    accept: Optional[str] = Header(None),
 ):
     """
     Returns a sorted matrix of all 16 transport × packaging combinations,
     ranked by eco score (best first).
+
+    `layout=columnar` returns `columns` (one array per field, rows aligned
+    by index) instead of `options`, so field names are sent only once.
+    Combine with `Accept: application/msgpack` for the most compact payload.
     """
     try:
-        results = []
-        for transport in ["car", "motorcycle", "electric_vehicle", "bike"]:
-            for packaging in ["plastic", "paper", "biodegradable", "reusable"]:
-                t_factor = greenpt.get_emission_factor("transport", transport)
-                p_factor = greenpt.get_emission_factor("packaging", packaging)
-                emissions = round(distance_km * t_factor + p_factor, 2)
-                time_min  = EmissionsCalculator.estimate_time(distance_km, transport)
-                score     = EmissionsCalculator.calculate_eco_score(emissions, distance_km)
-
-                results.append({
-                    "transport_mode":          transport,
-                    "packaging_type":          packaging,
-                    "carbon_emission_grams":   emissions,
-                    "estimated_time_minutes":  time_min,
-                    "eco_score":               score,
-                    "rating":                  EmissionsCalculator.get_rating(score),
-                })
-
-        results.sort(key=lambda x: x["eco_score"], reverse=True)
-
-        return {
+        results = EmissionsCalculator.compare_all_options(
+            distance_km, greenpt.get_emission_factor
+        )
+
+        if layout == "columnar":
+            return negotiate({
+                "distance_km":   distance_km,
+                "total_options": len(results),
+                "layout":        layout,
+                "columns":       to_columnar(results),
+            }, accept)
+
+        return negotiate({
             "distance_km":   distance_km,
             "total_options": len(results),
             "options":       results,
-        }
+        }, accept)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -194,34 +240,31 @@ def compare_alternatives(
 @app.get(
     "/api/v1/user-impact/{user_id}",
     response_model=UserImpactResponse,
+    responses=msgpack_responses(UserImpactResponse),
     tags=["impact"],
     summary="Get a user's cumulative environmental impact and Eco Score",
 )
-def get_user_impact(user_id: str, days: int = 365, db: Session = Depends(get_db)):
+def get_user_impact(
+    user_id: str,
+    days: int = Query(365, ge=1, le=MAX_IMPACT_DAYS),
+    db: Session = Depends(get_db),
+    accept: Optional[str] = Header(None),
+):
     """
     Returns gamified sustainability metrics for a given user.
 
-    Fetches actual order history from SQLite database and aggregates the 
-    carbon ledger dynamically.
+    Aggregates the carbon ledger over the last `days` days, spanning the hot
+    `orders` table and only the archived months that overlap the window.
     """
     try:
-        orders = db.query(OrderRecord).filter(OrderRecord.user_id == user_id).all()
-        total_orders = len(orders)
-        
-        if total_orders == 0:
-            avg_carbon_per_order = 0
-            eco_score = 0
-            total_carbon_kg = 0.0
-            carbon_saved_kg = 0.0
-        else:
-            total_emissions_g = sum(o.carbon_emission_grams for o in orders)
-            avg_carbon_per_order = total_emissions_g / total_orders
-            total_carbon_kg = round(total_emissions_g / 1000, 2)
-            
-            # Baseline benchmark: assume 500g is a "standard" unchecked order
-            potential_carbon = total_orders * 500   
-            carbon_saved_kg  = round((potential_carbon - total_emissions_g) / 1000, 2)
-            eco_score        = int(sum(o.eco_score for o in orders) / total_orders)
+        totals = aggregate_user_orders(db, user_id, days)
+        total_orders = totals["total_orders"]
+        summary = EmissionsCalculator.summarise_orders(
+            total_orders, totals["emissions_g"], totals["eco_score_sum"]
+        )
+        avg_carbon_per_order = summary["avg_carbon_per_order"]
+        eco_score            = summary["eco_score"]
+        carbon_saved_kg      = summary["carbon_saved_kg"]
 
         # Wolfram-powered projection
         proj = wolfram.calculate_yearly_projection(
@@ -238,27 +281,133 @@ def get_user_impact(user_id: str, days: int = 365, db: Session = Depends(get_db)
         )
 
         # Achievements
-        achievements = []
-        if eco_score > 80:
-            achievements.append("🌟 Eco Champion")
-        if total_orders > 50:
-            achievements.append("🌱 Sustainability Advocate")
-        if carbon_saved_kg > 10:
-            achievements.append("🌍 Carbon Saver")
-
-        return UserImpactResponse(
+        achievements = EmissionsCalculator.get_achievements(
+            eco_score, total_orders, carbon_saved_kg
+        )
+
+        return negotiate(UserImpactResponse(
             total_orders           = total_orders,
             eco_score              = eco_score,
             total_carbon_saved_kg  = carbon_saved_kg,
             rank_percentile        = random.randint(75, 95),
             achievements           = achievements,
             yearly_projection      = yearly,
-        )
+        ), accept)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ── GET /api/v1/user-impact/{user_id}/stream ─────────────────────────
+def _load_impact_totals(user_id: str, days: int) -> dict:
+    """Aggregate a user's ledger once per stream to seed running totals."""
+    db = SessionLocal()
+    try:
+        return aggregate_user_orders(db, user_id, days)
+    finally:
+        db.close()
+
+
+def _impact_snapshot(totals: dict, last_order: Optional[dict] = None) -> dict:
+    summary = EmissionsCalculator.summarise_orders(
+        totals["total_orders"], totals["emissions_g"], totals["eco_score_sum"]
+    )
+    return {
+        "total_orders":          totals["total_orders"],
+        "eco_score":             summary["eco_score"],
+        "total_carbon_kg":       summary["total_carbon_kg"],
+        "total_carbon_saved_kg": summary["carbon_saved_kg"],
+        "achievements":          EmissionsCalculator.get_achievements(
+            summary["eco_score"], totals["total_orders"], summary["carbon_saved_kg"]
+        ),
+        "last_order":            last_order,
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get(
+    "/api/v1/user-impact/{user_id}/stream",
+    tags=["impact"],
+    summary="Live stream of a user's totals, Eco Score and achievements (SSE)",
+)
+async def stream_user_impact(
+    user_id: str,
+    request: Request,
+    days: int = Query(365, ge=1, le=MAX_IMPACT_DAYS),
+):
+    """
+    Server-Sent Events stream that replaces polling `GET /user-impact/{user_id}`.
+
+    Sends one `impact` event with the current totals on connect, then another
+    each time `analyze-order` records an order for this user. Totals cover
+    the last `days` days, as in `GET /user-impact/{user_id}`, and are kept
+    as running sums, so the order history is not reloaded on every update.
+    They are re-aggregated every `STREAM_RESEED_SECONDS` so the window keeps
+    sliding, and a comment line is sent every `STREAM_KEEPALIVE_SECONDS` to
+    keep idle connections open through proxies.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def event_stream():
+        # Subscribe before seeding so no order committed in between is missed
+        subscription = impact_broker.subscribe(user_id)
+        dropped_seen = 0
+        try:
+            totals = await run_in_threadpool(_load_impact_totals, user_id, days)
+            # Newest order the seed query counted. Live events can arrive out of
+            # id order (publishing threads race), so this is never advanced by them.
+            seeded_through = totals["last_order_id"]
+            seeded_at = loop.time()
+            yield _sse("impact", _impact_snapshot(totals))
+
+            while True:
+                try:
+                    order = await asyncio.wait_for(
+                        subscription.get(), timeout=STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    order = None
+
+                # Buffer overflowed (running sums missed orders) or the window
+                # has moved on: re-aggregate and start a fresh seed
+                overflowed = subscription.dropped != dropped_seen
+                if overflowed or loop.time() - seeded_at >= STREAM_RESEED_SECONDS:
+                    dropped_seen = subscription.dropped
+                    previous = _impact_snapshot(totals)
+                    totals = await run_in_threadpool(_load_impact_totals, user_id, days)
+                    seeded_through = totals["last_order_id"]
+                    seeded_at = loop.time()
+                    if order is not None or _impact_snapshot(totals) != previous:
+                        yield _sse("impact", _impact_snapshot(totals, order))
+                        continue
+
+                if order is None:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                # Already counted by the seed query
+                if order["order_id"] <= seeded_through:
+                    continue
+                totals["total_orders"]  += 1
+                totals["emissions_g"]   += order["carbon_emission_grams"]
+                totals["eco_score_sum"] += order["eco_score"]
+                totals["last_order_id"]  = max(totals["last_order_id"], order["order_id"])
+                yield _sse("impact", _impact_snapshot(totals, order))
+        finally:
+            impact_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -153,6 +153,33 @@ class EmissionsCalculator:
         
         return alternatives[:3]  # Return top 3
     
+    @staticmethod
+    def compare_all_options(distance_km: float, get_emission_factor) -> list:
+        """
+        Every transport × packaging combination, ranked by eco score (best first).
+        `get_emission_factor(category, item)` supplies the factors, e.g. GreenPT.
+        """
+        results = []
+        for transport in ["car", "motorcycle", "electric_vehicle", "bike"]:
+            for packaging in ["plastic", "paper", "biodegradable", "reusable"]:
+                t_factor = get_emission_factor("transport", transport)
+                p_factor = get_emission_factor("packaging", packaging)
+                emissions = round(distance_km * t_factor + p_factor, 2)
+                time_min  = EmissionsCalculator.estimate_time(distance_km, transport)
+                score     = EmissionsCalculator.calculate_eco_score(emissions, distance_km)
+
+                results.append({
+                    "transport_mode":          transport,
+                    "packaging_type":          packaging,
+                    "carbon_emission_grams":   emissions,
+                    "estimated_time_minutes":  time_min,
+                    "eco_score":               score,
+                    "rating":                  EmissionsCalculator.get_rating(score),
+                })
+
+        results.sort(key=lambda x: x["eco_score"], reverse=True)
+        return results
+    
     @staticmethod
     def get_environmental_context(carbon_kg: float) -> str:
         """Provide context for carbon emissions"""
@@ -165,4 +192,37 @@ class EmissionsCalculator:
         elif carbon_kg < 10:
             return "That's equivalent to a short car trip of 80 km."
         else:
-            return f"That's equivalent to driving {int(carbon_kg * 8)} km by car."
\ No newline at end of file
+            return f"That's equivalent to driving {int(carbon_kg * 8)} km by car."
+    
+    @staticmethod
+    def summarise_orders(total_orders: int, total_emissions_g: float, eco_score_sum: float) -> dict:
+        """
+        Aggregate a user's carbon ledger from running totals.
+        Baseline benchmark: assume 500g is a "standard" unchecked order.
+        """
+        if total_orders == 0:
+            return {
+                "avg_carbon_per_order": 0,
+                "eco_score": 0,
+                "total_carbon_kg": 0.0,
+                "carbon_saved_kg": 0.0,
+            }
+        potential_carbon = total_orders * 500
+        return {
+            "avg_carbon_per_order": total_emissions_g / total_orders,
+            "eco_score": int(eco_score_sum / total_orders),
+            "total_carbon_kg": round(total_emissions_g / 1000, 2),
+            "carbon_saved_kg": round((potential_carbon - total_emissions_g) / 1000, 2),
+        }
+
+    @staticmethod
+    def get_achievements(eco_score: int, total_orders: int, carbon_saved_kg: float) -> list:
+        """Gamification badges unlocked by a user's totals"""
+        achievements = []
+        if eco_score > 80:
+            achievements.append("🌟 Eco Champion")
+        if total_orders > 50:
+            achievements.append("🌱 Sustainability Advocate")
+        if carbon_saved_kg > 10:
+            achievements.append("🌍 Carbon Saver")
+        return achievements
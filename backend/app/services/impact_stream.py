@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One listener's bounded event buffer, bound to the event loop it was created on.
+    When the buffer is full the oldest event is dropped and `dropped` is
+    bumped, so publishers never block and a slow client can tell it must
+    resynchronise.
+    """
+
+    def __init__(self, user_id: str, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        # Runs on self.loop only
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+
+class ImpactBroker:
+    """
+    In-process pub/sub for per-user impact updates.
+
+    Subscribers are idle coroutines waiting on a small queue, so a worker can
+    hold thousands of open streams cheaply. `publish` is safe to call from
+    sync endpoints running in FastAPI's threadpool: delivery is handed to
+    each subscriber's event loop with `call_soon_threadsafe`.
+    """
+
+    def __init__(self, buffer_size: int = 16):
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.buffer_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            listeners = self._subscribers.get(subscription.user_id)
+            if listeners is None:
+                return
+            listeners.discard(subscription)
+            if not listeners:
+                del self._subscribers[subscription.user_id]
+        if subscription.dropped:
+            logger.info(
+                f"Impact stream for {subscription.user_id} dropped "
+                f"{subscription.dropped} stale events"
+            )
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> int:
+        """Fan `event` out to every listener of `user_id`. Returns the listener count."""
+        with self._lock:
+            listeners = list(self._subscribers.get(user_id, ()))
+        for subscription in listeners:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Loop already closed (worker shutting down); nothing to deliver to
+                self.unsubscribe(subscription)
+        return len(listeners)
@@ -0,0 +1,83 @@
+"""
+Payload size and encode/decode time: JSON vs MessagePack.
+
+Builds the same payloads the API returns (the 16-option compare matrix in
+row and columnar layouts, and a full `OrderAnalysisResponse`) and times
+each codec over many iterations.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_serialization [iterations]
+"""
+import json
+import sys
+import timeit
+
+import msgpack
+
+from app.content_negotiation import to_columnar
+from app.models import Alternative, OrderAnalysisResponse, YearlyProjection
+from app.services.emissions_calculator import EmissionsCalculator
+from app.services.greenpt_integration import GreenPTClient
+from app.services.wolfram_integration import WolframClient
+
+DISTANCE_KM = 5.0
+
+
+def build_analysis(greenpt: GreenPTClient, wolfram: WolframClient) -> dict:
+    emissions = round(DISTANCE_KM * greenpt.get_emission_factor("transport", "car")
+                      + greenpt.get_emission_factor("packaging", "plastic"), 2)
+    score = EmissionsCalculator.calculate_eco_score(emissions, DISTANCE_KM)
+    projection = wolfram.calculate_yearly_projection(emissions, 3, 350)
+    response = OrderAnalysisResponse(
+        carbon_emission_grams=emissions,
+        eco_score=score,
+        rating=EmissionsCalculator.get_rating(score),
+        better_alternatives=[
+            Alternative(**alt)
+            for alt in EmissionsCalculator.find_alternatives(DISTANCE_KM, "car", "plastic")
+        ],
+        yearly_projection=YearlyProjection(**projection),
+        environmental_context=EmissionsCalculator.get_environmental_context(
+            projection["total_carbon_kg"]
+        ),
+    )
+    return response.model_dump(mode="json")
+
+
+def bench(name: str, payload: dict, iterations: int) -> None:
+    json_bytes = json.dumps(payload, separators=(",", ":")).encode()
+    msgpack_bytes = msgpack.packb(payload, use_bin_type=True)
+
+    codecs = {
+        "json":    (lambda: json.dumps(payload, separators=(",", ":")).encode(),
+                    lambda: json.loads(json_bytes),
+                    len(json_bytes)),
+        "msgpack": (lambda: msgpack.packb(payload, use_bin_type=True),
+                    lambda: msgpack.unpackb(msgpack_bytes, raw=False),
+                    len(msgpack_bytes)),
+    }
+
+    print(f"\n{name}")
+    print(f"  {'codec':<8} {'bytes':>7} {'encode µs':>10} {'decode µs':>10}")
+    for codec, (encode, decode, size) in codecs.items():
+        enc_us = timeit.timeit(encode, number=iterations) / iterations * 1e6
+        dec_us = timeit.timeit(decode, number=iterations) / iterations * 1e6
+        print(f"  {codec:<8} {size:>7} {enc_us:>10.2f} {dec_us:>10.2f}")
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    greenpt = GreenPTClient()
+    wolfram = WolframClient()
+
+    rows = EmissionsCalculator.compare_all_options(DISTANCE_KM, greenpt.get_emission_factor)
+    base = {"distance_km": DISTANCE_KM, "total_options": len(rows)}
+
+    bench("compare-alternatives (rows)", {**base, "options": rows}, iterations)
+    bench("compare-alternatives (columnar)",
+          {**base, "layout": "columnar", "columns": to_columnar(rows)}, iterations)
+    bench("analyze-order response", build_analysis(greenpt, wolfram), iterations)
+
+
+if __name__ == "__main__":
+    main()